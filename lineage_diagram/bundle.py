@@ -1,10 +1,10 @@
 import numpy        as np
 
 from dataclasses import dataclass
-from typing      import TYPE_CHECKING
+from typing      import TYPE_CHECKING, Optional
 
 from .paths      import ShiftablePath, ShiftEvent
-from .utils      import find_t_at_x, smootherstep
+from .utils      import find_t_at_x, remove_folds, sample_path, smootherstep
 
 if TYPE_CHECKING:
   from .diagram import Diagram
@@ -14,6 +14,7 @@ if TYPE_CHECKING:
 class BundleMembership:
   """
   Represents the membership of a lineage in a bundle.
+  An infinite end_x means the lineage stays in the bundle until its end.
   """
   lineage:           "Lineage"
   start_x:           float
@@ -37,6 +38,9 @@ class Bundle(ShiftablePath):
     ):
     diagram.add_bundle(self)
     self.diagram = diagram
+    # Parameters of the baseline at the queried X positions, valid until the baseline changes
+    self._t_at_x_cache: dict[float, float] = {}
+
     self.start_x = start_x
     self.start_y = start_y
     self.margin  = margin
@@ -46,12 +50,55 @@ class Bundle(ShiftablePath):
     self._memberships:  list[BundleMembership] = []
 
     # Computed points for members
-    self._compiled_member_points: dict["Lineage", tuple[list[complex], list[complex]]] = {}
+    self._compiled_member_points: dict["Lineage", tuple[np.ndarray, np.ndarray]] = {}
+    self._solved_version:         Optional[int] = None
+
+    # Samples of the baseline from the last solve
+    self._baseline_samples: tuple[np.ndarray, np.ndarray] = (np.empty(0, dtype=complex), np.empty(0, dtype=complex))
+
+    # Geometry of the members at the queried X positions, valid for a single state of the diagram
+    self._member_geometry_cache:       dict[tuple[float, "Lineage"], tuple[complex, complex]] = {}
+    self._member_geometry_cache_state: Optional[tuple[int, bool]] = None
 
   @property
   def end_x(self) -> float:
     return self.diagram.view_width
 
+  @property
+  def start_x(self) -> float:
+    """X position where the bundle starts."""
+    return self._start_x
+
+  @start_x.setter
+  def start_x(self, start_x:float):
+    """Set the start X position, the geometry is recomputed."""
+    self._start_x = start_x
+    self._invalidate_baseline_path()
+    self.diagram._invalidate()
+
+  @property
+  def start_y(self) -> float:
+    """Y position where the bundle starts."""
+    return self._start_y
+
+  @start_y.setter
+  def start_y(self, start_y:float):
+    """Set the start Y position, the geometry is recomputed."""
+    self._start_y = start_y
+    self._invalidate_baseline_path()
+    self.diagram._invalidate()
+
+  @property
+  def margin(self) -> float:
+    """Margin between the members."""
+    return self._margin
+
+  @margin.setter
+  def margin(self, margin:float):
+    """Set the margin between the members, the geometry is recomputed."""
+    self._margin = margin
+    self.diagram._invalidate()
+
   @property
   def memberships(self) -> list[BundleMembership]:
     """Public accessor for memberships."""
@@ -104,6 +151,8 @@ class Bundle(ShiftablePath):
             break
         self._memberships.insert(insert_pos, new_membership)
 
+    self.diagram._invalidate()
+
   def shift_to(self, from_x:float, to_x:float, to_y:float):
     """Shift bundle to new Y position over X range."""
     self._shift_events.append(ShiftEvent(
@@ -111,120 +160,177 @@ class Bundle(ShiftablePath):
       to_x   = to_x,
       to_y   = to_y,
     ))
+    self._invalidate_baseline_path()
+    self.diagram._invalidate()
 
   def get_memberships_at(self, x:float) -> list[BundleMembership]:
     """Return memberships active at X, sorted by insertion order."""
     return [membership for membership in self._memberships if membership.start_x <= x <= membership.end_x]
 
-  def _get_factor(self, membership:BundleMembership, x:float) -> float:
-    """Calculate the presence factor (0 to 1) of a member at position X."""
+  def _get_factors(self, membership:BundleMembership, xs:np.ndarray) -> np.ndarray:
+    """Calculate the presence factors (0 to 1) of a member at an array of X positions."""
+    factors = np.ones_like(xs)
     # Fade In
-    if x < membership.start_x + membership.fade_in_duration:
-      if membership.fade_in_duration <= 1e-5: return 1.0
-      ratio = (x - membership.start_x) / membership.fade_in_duration
-      return smootherstep(ratio)
+    fade_in = xs < membership.start_x + membership.fade_in_duration
+    if membership.fade_in_duration > 1e-5:
+      factors[fade_in] = smootherstep((xs[fade_in] - membership.start_x) / membership.fade_in_duration)
     # Fade Out
-    elif x > membership.end_x - membership.fade_out_duration:
-      if membership.fade_out_duration <= 1e-5: return 1.0
-      start_fade_out = membership.end_x - membership.fade_out_duration
-      ratio = (x - start_fade_out) / membership.fade_out_duration
-      return 1.0 - smootherstep(ratio)
-    # Stable
-    return 1.0
-
-  def _calculate_layout(self, memberships:list[BundleMembership], x:float) -> tuple[list[float],list]:
-    """Calculate widths and margins for all members at X to ensure smooth transitions."""
-    factors = [self._get_factor(membership, x) for membership in memberships]
-
-    # Calculate effective widths (lineage width scaled by factor)
-    effective_widths = [membership.lineage.get_width_at(x) * factor for membership, factor in zip(memberships, factors)]
-
-    # Create the array of gaps
-    count = len(memberships)
-    gaps  = []
-
-    if count > 1:
+    fade_out = ~fade_in & (xs > membership.end_x - membership.fade_out_duration)
+    if membership.fade_out_duration > 1e-5:
+      start_fade_out    = membership.end_x - membership.fade_out_duration
+      factors[fade_out] = 1.0 - smootherstep((xs[fade_out] - start_fade_out) / membership.fade_out_duration)
+    return factors
+
+  def _calculate_layouts(self, widths:np.ndarray, factors:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized _calculate_layout over many positions sharing the same active members.
+    Widths and factors are arrays of shape (positions, members).
+    """
+    effective_widths = widths * factors
+    gaps             = np.zeros_like(factors)
+
+    if factors.shape[1] > 1:
       # Initial gaps: each member contributes half a margin multiplied by their presense factors
-      for index in range(count - 1):
-        gaps.append(0.5 * self.margin * (factors[index] + factors[index+1]))
-
-      # Edge correction: The "average" formula assumes neighbors exist on both sides
-      # and are fully present (factor 1.0). We must remove the margin allocated to
-      # the empty space at the start and end.
-      start_excess = 0.5 * self.margin * (1.0 - factors[0])
-      end_excess   = 0.5 * self.margin * (1.0 - factors[-1])
-
-      # Apply start correction (bottom to top)
-      for index in range(len(gaps)):
-        if start_excess <= 1e-5: break
-        correction    = min(gaps[index], start_excess)
-        gaps[index]  -= correction
-        start_excess -= correction
-
-      # Apply end correction (top to bottom)
-      for index in range(len(gaps)-1, -1, -1):
-        if end_excess <= 1e-5: break
-        correction  = min(gaps[index], end_excess)
-        gaps[index] -= correction
-        end_excess  -= correction
-
-    # Add a zero to make the list lengths match
-    if count > 0:
-      gaps.append(0)
+      inner_gaps = 0.5 * self.margin * (factors[:, :-1] + factors[:, 1:])
 
-    return effective_widths, gaps
-
-  def solve_geometry(self):
-    """Pre-calculate baseline and stacking for the whole duration."""
-    baseline_path = self.get_baseline_path()
+      # Edge correction: remove the margin allocated to the empty space at the start and end.
+      # Each correction consumes the gaps in order until the remaining excess is negligible.
+      start_excess = 0.5 * self.margin * (1.0 - factors[:, :1])
+      end_excess   = 0.5 * self.margin * (1.0 - factors[:, -1:])
 
-    # Initialize empty point lists for all members
-    self._compiled_member_points = {membership.lineage: ([], []) for membership in self._memberships}
+      def correct(gaps:np.ndarray, excess:np.ndarray) -> np.ndarray:
+        remaining = excess - np.cumsum(gaps, axis=1) + gaps
+        return gaps - np.where(remaining > 1e-5, np.minimum(gaps, remaining), 0.0)
 
-    # Work step by step at the configured resolution
-    for t in np.linspace(0, 1, self.diagram.resolution):
-      # Get parameters at this position alongside the path
-      point  = baseline_path.point(t)
-      normal = baseline_path.normal(t)
-      x      = point.real
+      # Apply start correction (bottom to top) then end correction (top to bottom)
+      inner_gaps = correct(inner_gaps, start_excess)
+      inner_gaps = correct(inner_gaps[:, ::-1], end_excess)[:, ::-1]
 
-      memberships = self.get_memberships_at(x)
-      if not memberships: continue
+      # The last member has no gap after it
+      gaps[:, :-1] = inner_gaps
 
-      # Get the widths and gaps
-      widths, gaps = self._calculate_layout(memberships, x)
-
-      # Total bundle width
-      bundle_width = sum(widths) + sum(gaps)
-
-      # Initial offset, start at the top
-      current_offset = -bundle_width / 2
+    return effective_widths, gaps
 
-      # Iterate over members in order
-      for membership, member_width, member_gap in zip(memberships, widths, gaps):
-        # Offset lines of this member
-        upper_offset = current_offset + member_width
-        lower_offset = current_offset
+  def _calculate_layout(self, memberships:list[BundleMembership], x:float) -> tuple[np.ndarray, np.ndarray]:
+    """Calculate widths and margins for all members at X to ensure smooth transitions."""
+    # Single position case of the vectorized layout
+    xs      = np.array([x])
+    factors = np.array([self._get_factors(membership, xs) for membership in memberships]).reshape(1, len(memberships))
+    widths  = np.array([membership.lineage.get_widths_at(xs) for membership in memberships]).reshape(factors.shape)
 
-        # Compute the points of the upper and lower edges of the path
-        upper_point = point + normal * upper_offset
-        lower_point = point + normal * lower_offset
+    # Get the widths and gaps
+    effective_widths, gaps = self._calculate_layouts(widths, factors)
+    return effective_widths[0], gaps[0]
 
-        # ToDo reimplement back-filtering here
-        self._compiled_member_points[membership.lineage][0].append(upper_point)
-        self._compiled_member_points[membership.lineage][1].append(lower_point)
+  def solve_geometry(self):
+    """Pre-calculate baseline and stacking for the whole duration."""
+    # Nothing changed since the last solve
+    if self._solved_version == self.diagram._state_version: return
+    self._solved_version = self.diagram._state_version
+    baseline_path        = self.get_baseline_path()
+
+    # Sample the baseline at the configured resolution in a single pass
+    points, normals = sample_path(baseline_path, np.linspace(0, 1, self.diagram.resolution))
+    xs              = points.real
+    self._baseline_samples = (points, normals)
+
+    # Presence of every membership at every sample
+    memberships = self._memberships
+    active      = np.array([(membership.start_x <= xs) & (xs <= membership.end_x) for membership in memberships]).T.reshape(len(xs), len(memberships))
+    factors     = np.array([self._get_factors(membership, xs) for membership in memberships]).T.reshape(active.shape)
+    widths      = np.array([membership.lineage.get_widths_at(xs) for membership in memberships]).T.reshape(active.shape)
+
+    # Offsets of the edges of every membership at every sample
+    upper_offsets = np.zeros(active.shape)
+    lower_offsets = np.zeros(active.shape)
+
+    # Samples with the same active members share the same layout, solve each group at once
+    patterns, groups = np.unique(active, axis=0, return_inverse=True)
+    for group_index, pattern in enumerate(patterns):
+      if not pattern.any(): continue
+      rows = np.flatnonzero(groups.reshape(-1) == group_index)
+      cols = np.flatnonzero(pattern)
 
-        # Update bundle offset
-        current_offset += member_width + member_gap
+      # Get the widths and gaps
+      group_widths, group_gaps = self._calculate_layouts(widths[np.ix_(rows, cols)], factors[np.ix_(rows, cols)])
+
+      # Total bundle width, start at the top and stack the members in order
+      bundle_width = group_widths.sum(axis=1, keepdims=True) + group_gaps.sum(axis=1, keepdims=True)
+      lower_offset = -bundle_width / 2 + np.cumsum(group_widths + group_gaps, axis=1) - group_widths - group_gaps
+      lower_offsets[np.ix_(rows, cols)] = lower_offset
+      upper_offsets[np.ix_(rows, cols)] = lower_offset + group_widths
+
+    # Compute the points of the upper and lower edges of the paths
+    upper_points = points[:, None] + normals[:, None] * upper_offsets
+    lower_points = points[:, None] + normals[:, None] * lower_offsets
+
+    # Gather the points of each member in sample order, merging its successive memberships
+    self._compiled_member_points = {}
+    for lineage in dict.fromkeys(membership.lineage for membership in memberships):
+      cols = [index for index, membership in enumerate(memberships) if membership.lineage is lineage]
+      self._compiled_member_points[lineage] = (
+        upper_points[:, cols][active[:, cols]],
+        lower_points[:, cols][active[:, cols]],
+      )
+
+    # Back-filtering: drop the points where the member edges fold back on tight turns
+    for lineage, (upper_points, lower_points) in self._compiled_member_points.items():
+      self._compiled_member_points[lineage] = (
+        remove_folds(upper_points),
+        remove_folds(lower_points),
+      )
+
+  def _invalidate_baseline_path(self):
+    """Discard the cached baseline path and the parameters found on it."""
+    super()._invalidate_baseline_path()
+    self._t_at_x_cache.clear()
+
+  def _get_t_at_x(self, x:float) -> float:
+    """Find the parameter of the baseline at X, memoized as lineages query the same positions repeatedly."""
+    if x not in self._t_at_x_cache:
+      self._t_at_x_cache[x] = find_t_at_x(self.get_baseline_path(), x)
+    return self._t_at_x_cache[x]
+
+  def _get_baseline_at(self, x:float) -> tuple[complex, complex]:
+    """
+    Get the point and unit normal of the baseline at X.
+    Once solved, interpolates the samples of the solve, consistent with the compiled member edges.
+    """
+    points, normals = self._baseline_samples
+    if self._solved_version == self.diagram._state_version and len(points) > 1:
+      # Interpolate between the samples around X
+      index  = int(np.clip(np.searchsorted(points.real, x), 1, len(points) - 1))
+      before = complex(points[index-1])
+      after  = complex(points[index])
+      span   = after.real - before.real
+      ratio  = min(1.0, max(0.0, (x - before.real) / span)) if span > 0 else 0.0
+      normal = complex(normals[index-1] + (normals[index] - normals[index-1]) * ratio)
+      return before + (after - before) * ratio, normal / abs(normal)
+
+    # Not solved yet, evaluate the baseline exactly
+    points, normals = sample_path(self.get_baseline_path(), np.array([self._get_t_at_x(x)]))
+    return complex(points[0]), complex(normals[0])
 
   def _get_member_geometry_at(self, x:float, lineage:"Lineage") -> tuple[complex, complex]:
+    """
+    Get the upper and lower points of a member at a specific X.
+    Memoized as segment boundaries are queried both when compiling the lineage and when fetching its points.
+    """
+    # Drop the memoized geometry if the diagram changed or the bundle was solved since
+    cache_state = (self.diagram._state_version, self._solved_version == self.diagram._state_version)
+    if self._member_geometry_cache_state != cache_state:
+      self._member_geometry_cache.clear()
+      self._member_geometry_cache_state = cache_state
+
+    key = (x, lineage)
+    if key not in self._member_geometry_cache:
+      self._member_geometry_cache[key] = self._calculate_member_geometry_at(x, lineage)
+    return self._member_geometry_cache[key]
+
+  def _calculate_member_geometry_at(self, x:float, lineage:"Lineage") -> tuple[complex, complex]:
     """Calculate the upper and lower points of a member at a specific X."""
-    baseline_path  = self.get_baseline_path()
-    t              = find_t_at_x(baseline_path, x)
-
     # Get parameters at this position alongside the path
-    point          = baseline_path.point(t)
-    normal         = baseline_path.normal(t)
+    point, normal  = self._get_baseline_at(x)
     x_on_path      = point.real
 
     memberships    = self.get_memberships_at(x_on_path)
@@ -232,24 +338,18 @@ class Bundle(ShiftablePath):
     # Get the widths and gaps
     widths, gaps   = self._calculate_layout(memberships, x_on_path)
 
-    # Total bundle width
-    bundle_width   = sum(widths) + sum(gaps)
+    # Total bundle width, start at the top and stack the members in order
+    steps          = np.add(widths, gaps)
+    lower_offsets  = np.cumsum(steps) - steps - steps.sum() / 2
 
-    # Initial offset, start at the top
-    current_offset = -bundle_width / 2
-
-    # Iterate over members in order
-    for membership, member_width, member_gap in zip(memberships, widths, gaps):
-      # If found the requested lineage
+    # Find the requested lineage among the members in order
+    for index, membership in enumerate(memberships):
       if membership.lineage == lineage:
-        # Then return the position of its center
-        upper_point = point + normal * (current_offset + member_width)
-        lower_point = point + normal * current_offset
+        # Then return the position of its edges
+        upper_point = point + normal * float(lower_offsets[index] + widths[index])
+        lower_point = point + normal * float(lower_offsets[index])
         return upper_point, lower_point
 
-      # Else update the bundle offset
-      current_offset += member_width + member_gap
-
     # Lineage not found, fallback to bundle center
     print(f"ERROR: Lineage not found in bundle at {x=}.")
     return point, point
@@ -270,24 +370,27 @@ class Bundle(ShiftablePath):
     # Retrieve points for this lineage
     if lineage not in self._compiled_member_points:
       print("ERROR: No precompiled points this lineage in the bundle.")
-      return ([], [])
+      return (np.empty(0, dtype=complex), np.empty(0, dtype=complex))
     all_upper_points, all_lower_points = self._compiled_member_points[lineage]
 
-    # Filter points within x range
-    # ToDo replace with bisect or numpy masking for performance
-    filtered_upper_points = [upper_point for upper_point in all_upper_points if start_x <= upper_point.real <= end_x]
-    filtered_lower_points = [lower_point for lower_point in all_lower_points if start_x <= lower_point.real <= end_x]
+    # Filter points within x range, the back-filtered edges are sorted along X so bisect their bounds
+    def filter_points(points:np.ndarray) -> np.ndarray:
+      first = np.searchsorted(points.real, start_x, side="left")
+      last  = np.searchsorted(points.real, end_x,   side="right")
+      return points[first:last]
+    filtered_upper_points = filter_points(all_upper_points)
+    filtered_lower_points = filter_points(all_lower_points)
 
     # Interpolate start if missing
-    if not filtered_upper_points or filtered_upper_points[0].real > start_x + 1e-5:
+    if not filtered_upper_points.size or filtered_upper_points[0].real > start_x + 1e-5:
       upper_point, lower_point = self._get_member_geometry_at(start_x, lineage)
-      filtered_upper_points.insert(0, upper_point)
-      filtered_lower_points.insert(0, lower_point)
+      filtered_upper_points = np.insert(filtered_upper_points, 0, upper_point)
+      filtered_lower_points = np.insert(filtered_lower_points, 0, lower_point)
 
     # Interpolate end if missing
-    if not filtered_upper_points or filtered_upper_points[-1].real < end_x - 1e-5:
+    if not filtered_upper_points.size or filtered_upper_points[-1].real < end_x - 1e-5:
       upper_point, lower_point = self._get_member_geometry_at(end_x, lineage)
-      filtered_upper_points.append(upper_point)
-      filtered_lower_points.append(lower_point)
+      filtered_upper_points = np.append(filtered_upper_points, upper_point)
+      filtered_lower_points = np.append(filtered_lower_points, lower_point)
 
     return filtered_upper_points, filtered_lower_points
\ No newline at end of file
@@ -14,26 +14,63 @@ class Diagram:
       self,
       view_width:  float,
       view_height: float,
-      resolution:  int = 1000,
+      resolution:  int   = 1000,
+      precision:   int   = 2,
+      tolerance:   float = 0.1,
     ):
+    # Incremented on every modification, used to invalidate the cached geometry and drawings
+    self._state_version = 0
+
+    self._lineages: list["Lineage"] = []
+    self._bundles:  list["Bundle"]  = []
+
     self.view_width  = view_width
     self.view_height = view_height
     self.resolution  = resolution
-    self._lineages: list["Lineage"] = []
-    self._bundles:  list["Bundle"]  = []
+    self.precision   = precision
+    self.tolerance   = tolerance
+
+  @property
+  def view_width(self) -> float:
+    """Width of the view, where the unterminated lineages and the bundles end."""
+    return self._view_width
+
+  @view_width.setter
+  def view_width(self, view_width:float):
+    """Set the width of the view, the geometry is recomputed."""
+    self._view_width = view_width
+    # The baselines of the bundles extend to the edge of the view
+    for bundle in self._bundles:
+      bundle._invalidate_baseline_path()
+    self._invalidate()
+
+  @property
+  def resolution(self) -> int:
+    """Number of samples along the paths."""
+    return self._resolution
+
+  @resolution.setter
+  def resolution(self, resolution:int):
+    """Set the number of samples along the paths, the geometry is recomputed."""
+    self._resolution = resolution
+    self._invalidate()
 
   def add_lineage(self, lineage:"Lineage"):
     """Register a lineage to the diagram."""
     self._lineages.append(lineage)
+    self._invalidate()
 
   def add_bundle(self, bundle:"Bundle"):
     """Register a bundle to the diagram."""
     self._bundles.append(bundle)
+    self._invalidate()
+
+  def _invalidate(self):
+    """Mark the diagram as modified, lineages and bundles depend on each other so all caches are dropped."""
+    self._state_version += 1
 
   def generate(self, filepath:str="diagram.svg"):
     """Generate the diagram to an SVG file."""
-    svg_lines = []
-
     # Compile all bundles: compute their baselines and internal stacking
     print("Step 1: Solving bundle constraints...")
     for bundle in self._bundles:
@@ -43,19 +80,21 @@ class Diagram:
     print("Step 2: Compiling lineage segments...")
     for lineage in self._lineages:
       lineage.compile_segments()
-      svg_lines.append(lineage.draw())
 
     # Write SVG
     print("Step 3: Rendering...")
-    # Open SVG tag
-    svg_lines.insert(0, f'<svg width="{self.view_width}" height="{self.view_height}" viewBox="0 0 {self.view_width} {self.view_height}" xmlns="http://www.w3.org/2000/svg">')
-    # Close SVG tag
-    svg_lines.append('</svg>')
 
-    # Write the SVG file
+    # Stream the SVG file one lineage at a time instead of joining the whole document in memory
+    # Written in binary mode with the strings encoded directly, skipping the text layer
     try:
-      with open(filepath, 'w') as file:
-        file.write("\n".join(svg_lines))
+      with open(filepath, 'wb', buffering=1<<20) as file:
+        # Open SVG tag
+        file.write(f'<svg width="{self.view_width}" height="{self.view_height}" viewBox="0 0 {self.view_width} {self.view_height}" xmlns="http://www.w3.org/2000/svg">\n'.encode())
+        for lineage in self._lineages:
+          file.write(lineage.draw().encode())
+          file.write(b'\n')
+        # Close SVG tag
+        file.write(b'</svg>')
       print(f"Diagram successfully saved to {filepath}")
     except IOError as error:
       print(f"Error writing to file {filepath}: {error}")
@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class Line:
+  """Straight segment between two points in the complex plane."""
+  start: complex
+  end:   complex
+
+  def bpoints(self) -> tuple[complex, complex]:
+    """Control points of the segment."""
+    return (self.start, self.end)
+
+@dataclass(frozen=True)
+class CubicBezier:
+  """Cubic Bezier segment defined by its four control points in the complex plane."""
+  start:    complex
+  control1: complex
+  control2: complex
+  end:      complex
+
+  def bpoints(self) -> tuple[complex, complex, complex, complex]:
+    """Control points of the segment."""
+    return (self.start, self.control1, self.control2, self.end)
+
+class Path(list):
+  """
+  Sequence of connected line and cubic Bezier segments.
+  Only holds the geometry, the segments are evaluated with the vectorized helpers of utils.
+  """
+
+  @property
+  def start(self) -> complex:
+    return self[0].start
+
+  @property
+  def end(self) -> complex:
+    return self[-1].end
@@ -1,8 +1,12 @@
+import numpy as np
+
+from bisect import bisect_right
+
 from typing import TYPE_CHECKING, Optional
 
 from .paths    import ScalablePath, ShiftEvent, ScaleEvent, MembershipEvent, MembershipEventType
 from .segments import IndependentSegment, DependentSegment
-from .utils      import smootherstep
+from .utils      import simplify_polyline, smootherstep
 
 if TYPE_CHECKING:
   from .diagram import Diagram
@@ -32,16 +36,73 @@ class Lineage(ScalablePath):
 
     # Events lists
     self.membership_events: list[MembershipEvent] = []
-    self._shift_events:      list[ShiftEvent]      = []
-    self._scale_events:      list[ScaleEvent]      = []
+    self._shift_events:     list[ShiftEvent]      = []
+    self._scale_events:     list[ScaleEvent]      = []
+
+    # Start positions of the membership events, bisected to find the state at a position
+    self._membership_xs: list[float] = []
 
     # Computed segments
     self._computed_segments = []
 
+    # Cached compilation valid for the diagram state version it was computed at,
+    # and cached drawing valid for the render key it was drawn with
+    self._compiled_version: Optional[int]   = None
+    self._render_cache:     str             = ""
+    self._render_cache_key: Optional[tuple] = None
+
+    # Compiled points of the independent segments, reused when a segment keeps the same geometry
+    self._segment_cache: dict[tuple, tuple[np.ndarray, np.ndarray]] = {}
+
     # Internal state for compilation
     self._initial_bundle = None
     self.end_x           = None
 
+  @property
+  def start_x(self) -> float:
+    """X position where the lineage starts."""
+    return self._start_x
+
+  @start_x.setter
+  def start_x(self, start_x:float):
+    """Set the start X position, the geometry is recomputed."""
+    self._start_x = start_x
+    self.diagram._invalidate()
+
+  @property
+  def start_y(self) -> float:
+    """Y position where the lineage starts."""
+    return self._start_y
+
+  @start_y.setter
+  def start_y(self, start_y:float):
+    """Set the start Y position, the geometry is recomputed."""
+    self._start_y = start_y
+    self.diagram._invalidate()
+
+  @property
+  def start_w(self) -> float:
+    """Width of the lineage at its start."""
+    return self._start_w
+
+  @start_w.setter
+  def start_w(self, start_w:float):
+    """Set the start width, the geometry is recomputed."""
+    self._start_w = start_w
+    self._invalidate_scale_table()
+    self.diagram._invalidate()
+
+  @property
+  def end_x(self) -> Optional[float]:
+    """X position where the lineage ends, None if it lasts until the end of the view."""
+    return self._end_x
+
+  @end_x.setter
+  def end_x(self, end_x:Optional[float]):
+    """Set the end X position, the geometry is recomputed."""
+    self._end_x = end_x
+    self.diagram._invalidate()
+
   @classmethod
   def create_in_bundle(
       cls,
@@ -62,7 +123,7 @@ class Lineage(ScalablePath):
     in_bundle.add_member(
       lineage          = instance,
       start_x          = start_membership_x,
-      end_x            = diagram.view_width,
+      end_x            = np.inf, # Until the end of the bundle, whatever the width of the view
       fade_in_duration = fade_in_duration,
       index            = index,
     )
@@ -243,22 +304,7 @@ class Lineage(ScalablePath):
     # We need to resolve their Y position at merge_from_x
     def get_parent_y(parent: "Lineage") -> float:
       # Check bundle state
-      parent_bundle = None
-      for membership_event in sorted(parent.membership_events, key=lambda event: event.from_x):
-        if membership_event.from_x <= merge_from_x:
-          if membership_event.type == MembershipEventType.JOIN:
-            parent_bundle = membership_event.assembly
-          elif membership_event.type == MembershipEventType.LEAVE:
-            parent_bundle = None
-
-      if parent_bundle is None and parent._initial_bundle:
-         has_left = False
-         for membership_event in parent.membership_events:
-           if membership_event.type == MembershipEventType.LEAVE and membership_event.from_x <= merge_from_x:
-             has_left = True
-             break
-         if not has_left:
-           parent_bundle = parent._initial_bundle
+      parent_bundle = parent._get_bundle_at(merge_from_x)
 
       if parent_bundle:
         center = parent_bundle.get_center_point_of_member_at(merge_from_x, parent)
@@ -285,26 +331,7 @@ class Lineage(ScalablePath):
       # 2. Parent is in a bundle -> leave bundle to target Y
 
       # Check if parent is in a bundle at the start of the merge
-      parent_bundle = None
-      # Iterate backwards to find the active state
-      # ToDo: make this more robust
-      for membership_event in sorted(parent.membership_events, key=lambda event: event.from_x):
-        if membership_event.from_x <= merge_from_x:
-          if membership_event.type == MembershipEventType.JOIN:
-            parent_bundle = membership_event.assembly
-          elif membership_event.type == MembershipEventType.LEAVE:
-            parent_bundle = None
-
-      # Also check initial bundle state
-      if parent_bundle is None and parent._initial_bundle:
-         # Check if we haven't left it yet
-         has_left = False
-         for membership_event in parent.membership_events:
-           if membership_event.type == MembershipEventType.LEAVE and membership_event.from_x <= merge_from_x:
-             has_left = True
-             break
-         if not has_left:
-           parent_bundle = parent._initial_bundle
+      parent_bundle = parent._get_bundle_at(merge_from_x)
 
       # Determine target parameters
       # If child is in bundle, we target the child lineage dynamically
@@ -374,17 +401,7 @@ class Lineage(ScalablePath):
     )
 
     # We need to know if the parent is in a bundle at start_x
-    parent_bundle = None
-    if self._initial_bundle:
-       parent_bundle = self._initial_bundle
-
-    # Check events
-    for membership_event in sorted(self.membership_events, key=lambda event: event.from_x):
-      if membership_event.from_x <= start_x:
-        if membership_event.type == MembershipEventType.JOIN:
-          parent_bundle = membership_event.assembly
-        elif membership_event.type == MembershipEventType.LEAVE:
-          parent_bundle = None
+    parent_bundle = self._get_bundle_at(start_x)
 
     children = []
     for spec, start_w, start_center_rel in zip(children_specs, children_start_widths, children_start_centers_relative):
@@ -500,16 +517,7 @@ class Lineage(ScalablePath):
     )
 
     # 3. Resolve parent Y at start_x
-    parent_bundle = None
-    if parent._initial_bundle:
-       parent_bundle = parent._initial_bundle
-
-    for membership_event in sorted(parent.membership_events, key=lambda event: event.from_x):
-      if membership_event.from_x <= start_x:
-        if membership_event.type == MembershipEventType.JOIN:
-          parent_bundle = membership_event.assembly
-        elif membership_event.type == MembershipEventType.LEAVE:
-          parent_bundle = None
+    parent_bundle = parent._get_bundle_at(start_x)
 
     parent_y_at_start = parent.start_y
     if parent_bundle:
@@ -590,22 +598,7 @@ class Lineage(ScalablePath):
 
     def get_parent_y(parent: "Lineage") -> float:
       # Check bundle state
-      parent_bundle = None
-      for membership_event in sorted(parent.membership_events, key=lambda event: event.from_x):
-        if membership_event.from_x <= merge_from_x:
-          if membership_event.type == MembershipEventType.JOIN:
-            parent_bundle = membership_event.assembly
-          elif membership_event.type == MembershipEventType.LEAVE:
-            parent_bundle = None
-
-      if parent_bundle is None and parent._initial_bundle:
-         has_left = False
-         for membership_event in parent.membership_events:
-           if membership_event.type == MembershipEventType.LEAVE and membership_event.from_x <= merge_from_x:
-             has_left = True
-             break
-         if not has_left:
-           parent_bundle = parent._initial_bundle
+      parent_bundle = parent._get_bundle_at(merge_from_x)
 
       if parent_bundle:
         center = parent_bundle.get_center_point_of_member_at(merge_from_x, parent)
@@ -656,6 +649,7 @@ class Lineage(ScalablePath):
   def terminate_at(self, x:float):
     """Stop the lineage at X position."""
     self.end_x = x
+    self.diagram._invalidate()
 
   def shift_to(
       self,
@@ -667,20 +661,42 @@ class Lineage(ScalablePath):
     ):
     """Shift lineage to new Y position over X range."""
     self._shift_events.append(ShiftEvent(from_x, to_x, to_y, target_lineage, offset_y))
+    self.diagram._invalidate()
 
   def scale_to(self, from_x:float, to_x:float, to_w:float):
     """Scale lineage to new W width over X range."""
     self._scale_events.append(ScaleEvent(from_x, to_x, to_w))
+    self._invalidate_scale_table()
+    self.diagram._invalidate()
+
+  def _add_membership_event(self, membership_event:MembershipEvent):
+    """Register a membership event, keeping the events sorted by time so that readers don't sort them."""
+    self.membership_events.append(membership_event)
+    # Sort events by time, stable so that simultaneous events stay in insertion order
+    self.membership_events.sort(key=lambda membership_event: membership_event.from_x)
+    self.diagram._invalidate()
+
+  def _get_bundle_at(self, x:float) -> Optional["Bundle"]:
+    """Get the bundle the lineage is in at X, or None if independent, according to the last event started by X."""
+    # Rebuild the start positions when events were added, including directly to the public list
+    if len(self._membership_xs) != len(self.membership_events):
+      self.membership_events.sort(key=lambda membership_event: membership_event.from_x)
+      self._membership_xs = [membership_event.from_x for membership_event in self.membership_events]
+    count = bisect_right(self._membership_xs, x)
+    if count == 0:
+      return self._initial_bundle
+    last_event = self.membership_events[count - 1]
+    return last_event.assembly if last_event.type == MembershipEventType.JOIN else None
 
   def join(self, from_x:float, to_x:float, to_assembly:"Bundle", index:int=-1):
     """Join assembly over a transition X range."""
-    self.membership_events.append(MembershipEvent(from_x, to_x, MembershipEventType.JOIN, assembly=to_assembly))
+    self._add_membership_event(MembershipEvent(from_x, to_x, MembershipEventType.JOIN, assembly=to_assembly))
     # Inform the assembly of the new member.
     # The lineage starts entering at from_x, and is fully inside at to_x.
     to_assembly.add_member(
       lineage          = self,
       start_x          = from_x,
-      end_x            = self.diagram.view_width,
+      end_x            = np.inf, # Until the end of the bundle, whatever the width of the view
       fade_in_duration = to_x - from_x,
       index            = index,
     )
@@ -695,7 +711,7 @@ class Lineage(ScalablePath):
       offset_y:       float     = 0.0
     ):
     """Leave assembly over a transition X range."""
-    self.membership_events.append(MembershipEvent(
+    self._add_membership_event(MembershipEvent(
       from_x         = from_x,
       to_x           = to_x,
       type           = MembershipEventType.LEAVE,
@@ -737,9 +753,10 @@ class Lineage(ScalablePath):
 
   def compile_segments(self):
     """Converts events into geometry segments."""
+    # Nothing changed since the last compilation
+    if self._compiled_version == self.diagram._state_version: return
+    self._compiled_version  = self.diagram._state_version
     self._computed_segments = []
-    # Sort events by time
-    self.membership_events.sort(key=lambda membership_event: membership_event.from_x)
     current_x = self.start_x
     current_y = self.start_y
 
@@ -808,17 +825,18 @@ class Lineage(ScalablePath):
           # We don't update current_y because it's now managed by bundle
         else:
           # No next event
-          # Independent segment until the end of the lineage
-          segment = IndependentSegment(
-            diagram      = self.diagram,
-            start_x      = current_x,
-            start_y      = current_y,
-            start_w      = self.start_w,
-            end_x        = end_segment_x,
-            shift_events = segment_shifts,
-            scale_events = self._scale_events,
-          )
-          self._computed_segments.append(segment)
+          # Independent segment until the end of the lineage, skipped if empty
+          if end_segment_x > current_x:
+            segment = IndependentSegment(
+              diagram      = self.diagram,
+              start_x      = current_x,
+              start_y      = current_y,
+              start_w      = self.start_w,
+              end_x        = end_segment_x,
+              shift_events = segment_shifts,
+              scale_events = self._scale_events,
+            )
+            self._computed_segments.append(segment)
           current_x = end_segment_x
           # Update current_y based on last shift
           if segment_shifts:
@@ -883,16 +901,7 @@ class Lineage(ScalablePath):
   def _get_y_at(self, x: float) -> float:
     """Resolve the Y position of the lineage at a specific X, handling shifts and bundles."""
     # 1. Check bundle membership
-    parent_bundle = None
-    if self._initial_bundle:
-       parent_bundle = self._initial_bundle
-
-    for membership_event in sorted(self.membership_events, key=lambda event: event.from_x):
-      if membership_event.from_x <= x:
-        if membership_event.type == MembershipEventType.JOIN:
-          parent_bundle = membership_event.assembly
-        elif membership_event.type == MembershipEventType.LEAVE:
-          parent_bundle = None
+    parent_bundle = self._get_bundle_at(x)
 
     if parent_bundle:
       center_in_bundle = parent_bundle.get_center_point_of_member_at(x, self)
@@ -1003,26 +1012,63 @@ class Lineage(ScalablePath):
     self.shift_to(transition_from_x, end_x, end_y)
     self.terminate_at(end_x)
 
+  def _get_render_key(self) -> tuple:
+    """Key of the inputs of the drawing: the geometry through the diagram state version, and the rendering settings."""
+    return (
+      self.diagram._state_version,
+      self.color,
+      self.diagram.precision,
+      self.diagram.tolerance,
+    )
+
   def draw(self):
     """Draw the SVG path of the lineage."""
-    shape_path_d = ""
-    upper_points = []
-    lower_points = []
+    # Nothing changed since the last drawing
+    render_key = self._get_render_key()
+    if self._render_cache_key == render_key:
+      return self._render_cache
+    self._render_cache     = self._draw()
+    self._render_cache_key = render_key
+    return self._render_cache
+
+  def _draw(self) -> str:
+    """Build the SVG path of the lineage from the compiled segments."""
+    upper_points_parts = []
+    lower_points_parts = []
     # Gather points from all compiled segments
+    # Independent segments are looked up in the cache of the previous drawing, unused entries are dropped
+    segment_cache = {}
     for segment in self._computed_segments:
-      segment_upper_points, segment_lower_points = segment.compile()
-      upper_points.extend(segment_upper_points)
-      lower_points.extend(segment_lower_points)
-
-    if not upper_points: return ""
-
-    # Construct SVG Path
-    shape_path_d = f"M {upper_points[0].real} {upper_points[0].imag}"
-    for upper_point in upper_points[1:]:
-      shape_path_d += f" L {upper_point.real} {upper_point.imag}"
-    for lower_point in reversed(lower_points):
-      shape_path_d += f" L {lower_point.real} {lower_point.imag}"
-    shape_path_d += " Z"
+      if isinstance(segment, IndependentSegment):
+        cache_key = segment.get_cache_key()
+        if cache_key not in self._segment_cache:
+          self._segment_cache[cache_key] = segment.compile()
+        segment_cache[cache_key] = self._segment_cache[cache_key]
+        segment_upper_points, segment_lower_points = segment_cache[cache_key]
+      else:
+        segment_upper_points, segment_lower_points = segment.compile()
+      upper_points_parts.append(np.asarray(segment_upper_points, dtype=complex))
+      lower_points_parts.append(np.asarray(segment_lower_points, dtype=complex))
+
+    self._segment_cache = segment_cache
+
+    if not upper_points_parts: return ""
+    upper_points = np.concatenate(upper_points_parts)
+    lower_points = np.concatenate(lower_points_parts)
+    if not upper_points.size: return ""
+
+    # Drop the points that do not change the shape by more than the diagram tolerance
+    upper_points = simplify_polyline(upper_points, self.diagram.tolerance)
+    lower_points = simplify_polyline(lower_points, self.diagram.tolerance)
+
+    # Outline of the shape: upper edge followed by the reversed lower edge
+    outline     = np.concatenate((upper_points, lower_points[::-1]))
+    # A complex array already stores the X and Y of each point interleaved, view it as floats without copying
+    coordinates = outline.view(np.float64).tolist()
+
+    # Construct SVG Path, formatting all the coordinates in a single pass at the diagram precision
+    point_format = "%.{0}f %.{0}f".format(self.diagram.precision)
+    shape_path_d = ("M " + point_format + (" L " + point_format) * (len(outline) - 1) + " Z") % tuple(coordinates)
 
     shape_path_svg = f'<path fill="{self.color}" stroke="none" d="{shape_path_d}"/>'
     return shape_path_svg
@@ -1,9 +1,10 @@
-import svgpathtools as svg
+import numpy as np
 
 from dataclasses import dataclass
 from enum        import Enum
 from typing      import Optional, TYPE_CHECKING, Any
 
+from .geometry   import CubicBezier, Line, Path
 from .utils      import smootherstep
 
 if TYPE_CHECKING:
@@ -46,12 +47,23 @@ class PathBase:
 
 class ShiftablePath(PathBase):
   """Path with Y position that can shift."""
-  start_y:       float
-  _shift_events: list[ShiftEvent]
+  start_y:        float
+  _shift_events:  list[ShiftEvent]
+  _baseline_path: Optional[Path] = None
 
-  def get_baseline_path(self) -> svg.Path:
+  def get_baseline_path(self) -> Path:
+    """Get the baseline SVG path of the object, generated once and cached until the shifts change."""
+    if self._baseline_path is None:
+      self._baseline_path = self._build_baseline_path()
+    return self._baseline_path
+
+  def _invalidate_baseline_path(self):
+    """Discard the cached baseline path after the shift events are modified."""
+    self._baseline_path = None
+
+  def _build_baseline_path(self) -> Path:
     """Generate the baseline SVG path of the object."""
-    baseline_path = svg.Path()
+    baseline_path = Path()
     last_point    = complex(self.start_x, self.start_y)
 
     # Sort events by time
@@ -63,7 +75,7 @@ class ShiftablePath(PathBase):
 
       # Add line from previous shift if not touching
       if start_shift_point != last_point:
-        baseline_path.append(svg.Line(last_point, start_shift_point))
+        baseline_path.append(Line(last_point, start_shift_point))
 
       # Compute control points
       # The shift.to_y may be resolved dynamically upstream (in Lineage.compile_segments())
@@ -76,7 +88,7 @@ class ShiftablePath(PathBase):
 
       # Add cubic Bezier curve corresponding to the shift transformation
       if start_shift_point != end_shift_point:
-        baseline_path.append(svg.CubicBezier(
+        baseline_path.append(CubicBezier(
           start_shift_point,
           complex(shift_midpoint_x, start_shift_point.imag),
           complex(shift_midpoint_x, end_shift_point.imag),
@@ -92,7 +104,7 @@ class ShiftablePath(PathBase):
     end_point = complex(effective_end_x, last_point.imag)
 
     if end_point != last_point:
-      baseline_path.append(svg.Line(last_point, end_point))
+      baseline_path.append(Line(last_point, end_point))
 
     return baseline_path
 
@@ -100,36 +112,57 @@ class ScalablePath(PathBase):
   """Path with X width that can scale."""
   start_w:       float
   _scale_events: list[ScaleEvent]
+  _scale_table:  Optional[tuple[np.ndarray, ...]] = None
 
   def get_width_at(self, x: float) -> float:
     """Get the width of the object at X position."""
-    # If the object has ended, its width is 0
-    if self.end_x is not None and x > self.end_x:
-      return 0.0
+    return float(self.get_widths_at(np.array([x]))[0])
+
+  def _get_scale_table(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Get the scale events as structure of arrays sorted by time, built once and cached until the scales change.
+    Returns the arrays (from_x, span_x, from_w, to_w, reach_x), terminated by a sentinel event at infinity.
+    """
+    if self._scale_table is None:
+      scale_events = sorted(self._scale_events, key=lambda scale_event: scale_event.from_x)
+      from_x = np.array([scale_event.from_x for scale_event in scale_events] + [np.inf])
+      to_x   = np.array([scale_event.to_x   for scale_event in scale_events] + [np.inf])
+      to_w   = np.array([scale_event.to_w   for scale_event in scale_events], dtype=float)
+      # Width at the start of each event is the width at the end of the previous one
+      from_w = np.concatenate(([self.start_w], to_w))
+      to_w   = np.append(to_w, from_w[-1])
+      # Span of each event, the sentinel span is arbitrary but must not be infinite
+      span_x = np.append(to_x[:-1] - from_x[:-1], 1.0)
+      # An event determines the width of the positions before its end, or up to its start for
+      # instantaneous events. The first event determining the width at a position is the first
+      # whose running maximum reach is past that position.
+      reach_x = np.maximum.accumulate(np.maximum(to_x, np.nextafter(from_x, np.inf)))
+      self._scale_table = (from_x, span_x, from_w, to_w, reach_x)
+    return self._scale_table
+
+  def _invalidate_scale_table(self):
+    """Discard the cached scale table after the scale events are modified."""
+    self._scale_table = None
+
+  def get_widths_at(self, xs: np.ndarray) -> np.ndarray:
+    """Get the widths of the object at an array of X positions, evaluated for all positions at once."""
+    xs = np.asarray(xs, dtype=float)
+    from_x, span_x, from_w, to_w, reach_x = self._get_scale_table()
+
+    # Find the scale transformation determining the width at each position
+    indices = np.searchsorted(reach_x, xs, side="right")
+    x1      = from_x[indices]
+    w1      = from_w[indices]
+    w2      = to_w[indices]
+
+    # Before transformation, width of previous transformation
+    # Within transformation, interpolate with smoothing
+    within       = xs > x1
+    ratio_linear = np.divide(xs - x1, span_x[indices], out=np.zeros_like(xs), where=within)
+    widths       = np.where(within, w1 + (w2 - w1) * smootherstep(ratio_linear), w1)
 
-    # Initial width of the object
-    last_width = self.start_w
+    # If the object has ended, its width is 0
+    if self.end_x is not None:
+      widths[xs > self.end_x] = 0.0
 
-    # Sort events by time
-    self._scale_events.sort(key=lambda scale_event: scale_event.from_x)
-
-    # Iterate over scale transformations in order
-    for scale_event in self._scale_events:
-      # Before transformation, return width of previous transformation
-      if x <= scale_event.from_x:
-        return last_width
-      # Within transformation, interpolate with smoothing
-      elif scale_event.from_x < x < scale_event.to_x:
-        x1 = scale_event.from_x
-        x2 = scale_event.to_x
-        w1 = last_width
-        w2 = scale_event.to_w
-        ratio_linear = (x - x1) / (x2 - x1)
-        ratio_smooth = smootherstep(ratio_linear)
-        return w1 + (w2 - w1) * ratio_smooth
-      # After transformation, continue to next one
-      else:
-        last_width = scale_event.to_w
-
-    # Reached the end, return width of last transformation
-    return last_width
+    return widths
@@ -1,8 +1,9 @@
 import numpy as np
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 from .paths import ShiftablePath, ScalablePath, ShiftEvent, ScaleEvent
+from .utils import arc_length_to_t, remove_folds, sample_segment, segment_lengths
 
 if TYPE_CHECKING:
   from .diagram import Diagram
@@ -13,8 +14,8 @@ class Segment:
   """Base class for compiled segments ready to draw."""
   def __init__(self, diagram: "Diagram"):
     self.diagram       = diagram
-    self._upper_points = []
-    self._lower_points = []
+    self._upper_points = np.empty(0, dtype=complex)
+    self._lower_points = np.empty(0, dtype=complex)
 
 class IndependentSegment(Segment, ShiftablePath, ScalablePath):
   """Segment that calculates its own geometry based on compiled shifts."""
@@ -36,21 +37,45 @@ class IndependentSegment(Segment, ShiftablePath, ScalablePath):
     self._shift_events = shift_events
     self._scale_events = scale_events
 
-  def compile(self) -> tuple[list[complex], list[complex]]:
-    """Compile the segment and return the lists of upper and lower points of the shape."""
+    # Cached samples of the baseline
+    self._baseline_samples: Optional[tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+  def get_cache_key(self) -> tuple:
+    """Key identifying the geometry of the segment, equal for segments compiling to the same points."""
+    return (
+      self.start_x,
+      self.start_y,
+      self.start_w,
+      self.end_x,
+      self.diagram.resolution,
+      tuple((shift_event.from_x, shift_event.to_x, shift_event.to_y, shift_event.offset_y) for shift_event in self._shift_events),
+      tuple((scale_event.from_x, scale_event.to_x, scale_event.to_w) for scale_event in self._scale_events),
+    )
+
+  def sample_baseline(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sample the baseline of the segment at the diagram resolution, skipping the vertical jumps.
+    Returns the arrays of points, unit normals, and arc length fractions along their path segment.
+    Computed once and cached, to be shared between the compilation and any other consumer.
+    """
+    if self._baseline_samples is not None:
+      return self._baseline_samples
     baseline_path = self.get_baseline_path()
 
     # Handle degenerate case: Point-like segment
+    self._baseline_samples = (np.empty(0, dtype=complex), np.empty(0, dtype=complex), np.empty(0))
     if len(baseline_path) == 0:
-      return ([], [])
+      return self._baseline_samples
 
-    # Iterate over each segment in the path
-    for segment in baseline_path:
-        # Check if segment is vertical (jump)
-        start = segment.point(0)
-        end   = segment.point(1)
+    # Arc lengths of the segments, computed once for the whole path
+    lengths      = segment_lengths(baseline_path)
+    total_length = lengths.sum()
 
-        if abs(start.real - end.real) < 1e-5:
+    # Plan the sampling of each segment in the path
+    sampled_segments = []
+    for segment, seg_len in zip(baseline_path, lengths):
+        # Check if segment is vertical (jump)
+        if abs(segment.start.real - segment.end.real) < 1e-5:
             # Vertical segment (jump) - Skip
             continue
 
@@ -59,36 +84,58 @@ class IndependentSegment(Segment, ShiftablePath, ScalablePath):
         # But for now, let's use a fixed density or minimum samples
         # Simple approach: fixed samples per segment? Or proportional?
         # Let's use proportional to length, but at least 2 (start and end)
-        seg_len = segment.length()
         # Heuristic: 1 sample per unit? or based on diagram resolution?
         # diagram.resolution is total samples.
         # Let's just use a reasonable step.
-        num_samples = max(2, int(self.diagram.resolution * (seg_len / baseline_path.length())))
+        num_samples = max(2, round(self.diagram.resolution * (seg_len / total_length)))
+        sampled_segments.append((segment, num_samples))
+
+    if not sampled_segments:
+      return self._baseline_samples
+
+    # Preallocate the samples of all the segments, filled segment by segment behind a cursor
+    total_samples = sum(num_samples for _, num_samples in sampled_segments)
+    points        = np.empty(total_samples, dtype=complex)
+    normals       = np.empty(total_samples, dtype=complex)
+    fractions     = np.empty(total_samples)
+    cursor        = 0
 
-        for t in np.linspace(0, 1, num_samples):
-            point  = segment.point(t)
-            normal = segment.normal(t)
+    for segment, num_samples in sampled_segments:
+        # Sample all the points and normals of the segment at once, evenly spaced along the curve
+        ts = np.linspace(0, 1, num_samples)
+        points[cursor:cursor+num_samples], normals[cursor:cursor+num_samples] = sample_segment(segment, arc_length_to_t(segment, ts))
+        fractions[cursor:cursor+num_samples] = ts
+        cursor += num_samples
+
+    self._baseline_samples = (points, normals, fractions)
+    return self._baseline_samples
+
+  def compile(self) -> tuple[np.ndarray, np.ndarray]:
+    """Compile the segment and return the arrays of upper and lower points of the shape."""
+    points, normals, fractions = self.sample_baseline()
+
+    # Handle degenerate case: Point-like segment
+    if not points.size:
+      return (self._upper_points, self._lower_points)
 
-            # Query width with epsilon nudge towards segment interior
-            # to handle discontinuities at endpoints correctly.
-            query_x = point.real
-            if t < 0.5:
-                query_x += 1e-5
-            else:
-                query_x -= 1e-5
+    # Query width with epsilon nudge towards segment interior
+    # to handle discontinuities at endpoints correctly.
+    query_xs = np.where(fractions < 0.5, points.real + 1e-5, points.real - 1e-5)
 
-            width = self.get_width_at(query_x)
+    # Widths of the whole path in a single query
+    widths = self.get_widths_at(query_xs)
 
-            # Offset lines above and bellow the baseline
-            upper_offset =  width / 2
-            lower_offset = -width / 2
+    # Offset lines above and bellow the baseline
+    upper_offsets =  widths / 2
+    lower_offsets = -widths / 2
 
-            # Compute the position of the points of the upper and lower edges
-            upper_point = point + normal * upper_offset
-            lower_point = point + normal * lower_offset
+    # Compute the position of the points of the upper and lower edges
+    upper_points = points + normals * upper_offsets
+    lower_points = points + normals * lower_offsets
 
-            self._upper_points.append(upper_point)
-            self._lower_points.append(lower_point)
+    # Back-filtering: drop the points where the edges fold back on tight turns
+    self._upper_points = remove_folds(upper_points)
+    self._lower_points = remove_folds(lower_points)
 
     return (self._upper_points, self._lower_points)
 
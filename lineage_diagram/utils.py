@@ -1,37 +1,273 @@
-import svgpathtools as svg
+import numpy as np
+
+from functools import lru_cache
+from typing    import Union
+
+from .geometry import CubicBezier, Line, Path
 
 def smootherstep(x: float) -> float:
   """
   Compute the smootherstep function for a value between 0 and 1.
   This function provides a smooth transition with zero 1st and 2nd derivatives at endpoints.
-  Equation: 6x^5 - 15x^4 + 10x^3
+  Equation: 6x^5 - 15x^4 + 10x^3, evaluated in Horner form to avoid the powers on arrays
+  Values outside of [0, 1] are clamped. Accepts floats or NumPy arrays.
   """
-  return 6 * x**5 - 15 * x**4 + 10 * x**3
+  if isinstance(x, np.ndarray):
+    x = np.clip(x, 0.0, 1.0)
+  else:
+    x = min(1.0, max(0.0, x))
+  return x * x * x * (x * (6 * x - 15) + 10)
 
-def find_t_at_x(path: svg.Path, x: float, tolerance: float = 1e-6) -> float:
+def monotonic_mask(xs: np.ndarray) -> np.ndarray:
   """
-  Find the parameter t (0 to 1) on the path such that path.point(t).real is close to x.
-  Assumes the path is monotonic in X.
-  Uses binary search.
+  Compute the mask of the points of an edge to keep so that X never goes backward.
+  When an offset edge folds back on the inner side of a tight turn, it forms a loop spanning
+  from the X where it starts going backward to the X where it turns forward again. A point is
+  dropped if a later point lies behind it or an earlier point lies ahead of it, which removes
+  the loop and bridges it between the remaining points.
+  Single sweep in each direction using the running extremums of the X values.
   """
-  t_min = 0.0
-  t_max = 1.0
+  xs   = np.asarray(xs, dtype=float)
+  keep = np.ones(xs.shape, dtype=bool)
+  if xs.size > 1:
+    following_min_x = np.minimum.accumulate(xs[:0:-1])[::-1]
+    preceding_max_x = np.maximum.accumulate(xs[:-1])
+    keep[:-1] &= xs[:-1] <= following_min_x
+    keep[1:]  &= xs[1:]  >= preceding_max_x
+  return keep
 
-  # Check boundaries
-  if x <= path.point(t_min).real: return t_min
-  if x >= path.point(t_max).real: return t_max
+def remove_folds(points: np.ndarray) -> np.ndarray:
+  """
+  Back-filter an edge: remove the loops where it folds back on the inner side of tight turns.
+  The loops are dropped with monotonic_mask, and each one is closed at the crossing of the edge
+  before the loop with the edge after it, instead of bridging it with a chord.
+  """
+  points = np.asarray(points, dtype=complex)
+  keep   = monotonic_mask(points.real)
+  if keep.all(): return points
 
-  # Binary search
-  for _ in range(100):
-    t_mid = (t_min + t_max) / 2
-    p_mid = path.point(t_mid)
+  # Runs of consecutive dropped points, with their kept neighbours on each side
+  dropped    = np.flatnonzero(~keep)
+  run_breaks = np.flatnonzero(np.diff(dropped) > 1)
+  run_firsts = np.concatenate(([dropped[0]], dropped[run_breaks + 1])) - 1
+  run_lasts  = np.concatenate((dropped[run_breaks], [dropped[-1]])) + 1
 
-    if abs(p_mid.real - x) < tolerance:
-      return t_mid
+  crossing_indices = []
+  crossing_points  = []
+  for first, last in zip(run_firsts, run_lasts):
+    if first < 0 or last >= len(points): continue
+    loop = points[first:last+1]
+    # Edge going forward before the loop, and edge going forward again after it
+    turn_back    = int(np.argmax(loop.real[:-1]))
+    turn_forward = turn_back + int(np.argmin(loop.real[turn_back:]))
+    before       = loop[:turn_back+1]
+    after        = loop[turn_forward:]
+    after_xs     = np.maximum.accumulate(after.real)
+    # Height of the edge after the loop below each point before it, the bracketing points
+    # are found by binary search, and the crossing is where the height difference changes sign
+    overlap      = (before.real >= after_xs[0]) & (before.real <= after_xs[-1])
+    before       = before[overlap]
+    differences  = before.imag - np.interp(before.real, after_xs, after.imag)
+    sign_changes = np.flatnonzero(np.signbit(differences[:-1]) != np.signbit(differences[1:]))
+    if not sign_changes.size: continue
+    index    = sign_changes[0]
+    fraction = differences[index] / (differences[index] - differences[index+1])
+    crossing_indices.append(np.count_nonzero(keep[:last]))
+    crossing_points.append(before[index] + fraction * (before[index+1] - before[index]))
 
-    if p_mid.real < x:
-      t_min = t_mid
+  return np.insert(points[keep], crossing_indices, crossing_points)
+
+def simplify_polyline(points: np.ndarray, tolerance: float) -> np.ndarray:
+  """
+  Simplify a polyline of complex points with the Ramer-Douglas-Peucker algorithm.
+  Drops the points closer than the tolerance to the chord joining the kept points around them,
+  such as the many samples along straight parts of constant width.
+  """
+  if tolerance <= 0 or len(points) < 3: return points
+
+  keep     = np.zeros(len(points), dtype=bool)
+  keep[0]  = True
+  keep[-1] = True
+
+  # Split ranges at their furthest point from the chord until all the points are close enough
+  ranges = [(0, len(points) - 1)]
+  while ranges:
+    first, last = ranges.pop()
+    if last - first < 2: continue
+    chord  = points[last] - points[first]
+    inners = points[first+1:last] - points[first]
+    if chord == 0:
+      distances = np.abs(inners)
     else:
-      t_max = t_mid
+      distances = np.abs((inners * chord.conjugate()).imag) / abs(chord)
+    furthest = int(np.argmax(distances))
+    if distances[furthest] > tolerance:
+      split       = first + 1 + furthest
+      keep[split] = True
+      ranges.append((first, split))
+      ranges.append((split, last))
+
+  return points[keep]
+
+@lru_cache(maxsize=4096)
+def cubic_power_coefficients(p0: complex, p1: complex, p2: complex, p3: complex) -> tuple[complex, complex, complex, complex]:
+  """
+  Convert the control points of a cubic Bezier to the coefficients (a, b, c, d) of its power form.
+  The curve is then evaluated with Horner's scheme as P(t) = ((a*t + b)*t + c)*t + d,
+  and its derivative as P'(t) = (3*a*t + 2*b)*t + c.
+  """
+  a = -p0 + 3 * p1 - 3 * p2 + p3
+  b = 3 * p0 - 6 * p1 + 3 * p2
+  c = -3 * p0 + 3 * p1
+  d = p0
+  return a, b, c, d
+
+def sample_segment(segment: Union[Line, CubicBezier], ts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+  """
+  Sample the points and unit normals of a line or cubic Bezier segment at an array of parameters t.
+  Equivalent to calling segment.point(t) and segment.normal(t) for each t, in a single vectorized pass.
+  """
+  ts = np.asarray(ts, dtype=float)
+
+  if isinstance(segment, Line):
+    points   = segment.start + ts * (segment.end - segment.start)
+    tangents = np.full(ts.shape, segment.end - segment.start, dtype=complex)
+  else:
+    a, b, c, d = cubic_power_coefficients(*segment.bpoints())
+    # Point and derivative computed together, sharing the a*t product
+    a_ts     = a * ts
+    points   = ((a_ts + b) * ts + c) * ts + d
+    tangents = (3 * a_ts + 2 * b) * ts + c
+    # Where the derivative vanishes (coincident control points), the tangent is
+    # given by the limit direction, that is the first non-zero higher derivative
+    degenerate = np.abs(tangents) < 1e-12
+    if degenerate.any():
+      tangents[degenerate] = 6 * a * ts[degenerate] + 2 * b
+      degenerate = np.abs(tangents) < 1e-12
+      tangents[degenerate] = a
+
+  normals = -1j * tangents / np.abs(tangents)
+  return points, normals
+
+# Gauss-Legendre nodes and weights mapped to [0, 1], used to integrate the arc length of cubic segments
+_length_nodes, _length_weights = np.polynomial.legendre.leggauss(16)
+_length_nodes   = (_length_nodes + 1) / 2
+_length_weights = _length_weights / 2
+
+@lru_cache(maxsize=4096)
+def cubic_length(p0: complex, p1: complex, p2: complex, p3: complex) -> float:
+  """
+  Compute the arc length of a cubic Bezier, integrating the speed |P'(t)| with a fixed 16-point
+  Gauss-Legendre quadrature instead of the adaptive integration of segment.length().
+  """
+  a, b, c, _ = cubic_power_coefficients(p0, p1, p2, p3)
+  speeds     = np.abs((3 * a * _length_nodes + 2 * b) * _length_nodes + c)
+  return float(speeds @ _length_weights)
+
+def segment_lengths(path: Path) -> np.ndarray:
+  """Compute the arc length of every segment of a path in one pass, lines are exact."""
+  return np.array([
+    abs(segment.end - segment.start) if isinstance(segment, Line) else cubic_length(*segment.bpoints())
+    for segment in path
+  ], dtype=float)
+
+@lru_cache(maxsize=4096)
+def cubic_arc_length_table(p0: complex, p1: complex, p2: complex, p3: complex) -> tuple[np.ndarray, np.ndarray]:
+  """
+  Tabulate the cumulative arc length fraction (0 to 1) of a cubic Bezier against its parameter t.
+  Converting between both with np.interp spaces the samples evenly along the curve.
+  The arrays are shared between the callers of the cache, so they are read-only.
+  """
+  a, b, c, _ = cubic_power_coefficients(p0, p1, p2, p3)
+  ts         = np.linspace(0, 1, 65)
+  speeds     = np.abs((3 * a * ts + 2 * b) * ts + c)
+  lengths    = np.concatenate(([0.0], np.cumsum(speeds[1:] + speeds[:-1])))
+  # Point-like curve, keep the parameter as is
+  fractions  = lengths / lengths[-1] if lengths[-1] > 0 else ts
+  ts.setflags(write=False)
+  fractions.setflags(write=False)
+  return ts, fractions
+
+def arc_length_to_t(segment: Union[Line, CubicBezier], fractions: np.ndarray) -> np.ndarray:
+  """Convert arc length fractions (0 to 1) along a segment to its parameters t."""
+  if isinstance(segment, Line): return fractions
+  ts, table = cubic_arc_length_table(*segment.bpoints())
+  return np.interp(fractions, table, ts)
+
+def t_to_arc_length(segment: Union[Line, CubicBezier], ts: np.ndarray) -> np.ndarray:
+  """Convert parameters t of a segment to arc length fractions (0 to 1) along it."""
+  if isinstance(segment, Line): return ts
+  ts_table, table = cubic_arc_length_table(*segment.bpoints())
+  return np.interp(ts, ts_table, table)
+
+def find_t_at_x(path: Path, x: float, tolerance: float = 1e-6) -> float:
+  """
+  Find the parameter T (0 to 1) on the path such that the point at T has its X close to x.
+  Assumes the path is monotonic in X.
+  Locates the segment spanning X, then uses binary search on its power form.
+  """
+  # Check boundaries
+  if not len(path) or x <= path.start.real: return 0.0
+  if x >= path.end.real: return 1.0
+
+  # Find the first segment reaching X
+  index   = next(index for index, segment in enumerate(path) if segment.end.real >= x)
+  segment = path[index]
+
+  # Local parameter on the segment
+  if isinstance(segment, Line):
+    t = (x - segment.start.real) / (segment.end.real - segment.start.real)
+  else:
+    # Only the X polynomial is needed, keep its real coefficients out of the complex arithmetic
+    a, b, c, d = (coefficient.real for coefficient in cubic_power_coefficients(*segment.bpoints()))
+    t_min = 0.0
+    t_max = 1.0
+    # Binary search
+    for _ in range(100):
+      t     = (t_min + t_max) / 2
+      x_mid = ((a * t + b) * t + c) * t + d
+      if abs(x_mid - x) < tolerance:
+        break
+      if x_mid < x:
+        t_min = t
+      else:
+        t_max = t
+
+  # Map back to the path parameter using the cumulative length fractions, as in sample_path
+  lengths       = segment_lengths(path)
+  segment_end   = lengths[:index+1].sum() / lengths.sum()
+  segment_start = segment_end - lengths[index] / lengths.sum()
+  return segment_start + float(t_to_arc_length(segment, t)) * (segment_end - segment_start)
+
+def sample_path(path: Path, ts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+  """
+  Sample the points and unit normals of a path at an array of parameters T (0 to 1).
+  The parameter T is the arc length fraction along the path, so evenly spaced T give evenly
+  spaced points. Each segment of the path is evaluated once for all the T falling on it.
+  """
+  ts = np.asarray(ts, dtype=float)
+
+  # Map the path parameters to segment indices using the cumulative length fractions
+  lengths        = segment_lengths(path)
+  segment_ends   = np.cumsum(lengths) / lengths.sum()
+  segment_starts = segment_ends - lengths / lengths.sum()
+  indices        = np.minimum(np.searchsorted(segment_ends, ts), len(path) - 1)
+
+  # Local parameter on each segment
+  spans     = segment_ends[indices] - segment_starts[indices]
+  ts_local  = np.divide(ts - segment_starts[indices], spans, out=np.zeros_like(ts), where=spans > 0)
+  ts_local  = np.clip(ts_local, 0.0, 1.0)
+
+  # Group the parameters by segment into contiguous slices, the order is the identity for increasing T
+  order  = np.argsort(indices, kind="stable")
+  bounds = np.searchsorted(indices[order], np.arange(len(path) + 1))
+
+  # Evaluate each segment once over its contiguous slice of parameters
+  points  = np.empty(ts.shape, dtype=complex)
+  normals = np.empty(ts.shape, dtype=complex)
+  for index, segment in enumerate(path):
+    if bounds[index] == bounds[index+1]: continue
+    selection = order[bounds[index]:bounds[index+1]]
+    points[selection], normals[selection] = sample_segment(segment, arc_length_to_t(segment, ts_local[selection]))
 
-  return (t_min + t_max) / 2
+  return points, normals
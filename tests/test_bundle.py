@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+
+from lineage_diagram import Diagram, Bundle
+
+def reference_layout(widths:list[float], factors:list[float], margin:float) -> tuple[list[float], list[float]]:
+  """Scalar layout of the members at one position, consuming the edge excess gap by gap."""
+  effective_widths = [width * factor for width, factor in zip(widths, factors)]
+  count = len(factors)
+  gaps  = []
+  if count > 1:
+    for index in range(count - 1):
+      gaps.append(0.5 * margin * (factors[index] + factors[index+1]))
+    start_excess = 0.5 * margin * (1.0 - factors[0])
+    end_excess   = 0.5 * margin * (1.0 - factors[-1])
+    for index in range(len(gaps)):
+      if start_excess <= 1e-5: break
+      correction    = min(gaps[index], start_excess)
+      gaps[index]  -= correction
+      start_excess -= correction
+    for index in range(len(gaps)-1, -1, -1):
+      if end_excess <= 1e-5: break
+      correction  = min(gaps[index], end_excess)
+      gaps[index] -= correction
+      end_excess  -= correction
+  if count > 0:
+    gaps.append(0)
+  return effective_widths, gaps
+
+class TestCalculateLayouts(unittest.TestCase):
+  """The vectorized layout matches the scalar layout at every position."""
+
+  def assert_layouts(self, widths:np.ndarray, factors:np.ndarray, margin:float):
+    bundle = Bundle(Diagram(1000, 600), 0, 300, margin)
+    effective_widths, gaps = bundle._calculate_layouts(widths, factors)
+    for row in range(factors.shape[0]):
+      expected_widths, expected_gaps = reference_layout(list(widths[row]), list(factors[row]), margin)
+      np.testing.assert_allclose(effective_widths[row], expected_widths, rtol=0, atol=1e-12)
+      np.testing.assert_allclose(gaps[row],             expected_gaps,   rtol=0, atol=1e-12)
+
+  def test_partial_factors_at_both_edges(self):
+    factors = np.array([
+      [0.3, 1.0, 1.0, 0.6],
+      [0.0, 1.0, 1.0, 0.0],
+      [1.0, 1.0, 1.0, 1.0],
+      [0.5, 0.5, 0.5, 0.5],
+    ])
+    widths = np.array([[10.0, 20.0, 5.0, 8.0]] * len(factors))
+    self.assert_layouts(widths, factors, 4.0)
+
+  def test_excess_exceeding_first_gap(self):
+    # The start excess is larger than the first gap and carries into the next ones, same at the end
+    factors = np.array([
+      [0.1, 0.05, 1.0, 1.0],
+      [0.0, 0.0, 0.2, 1.0],
+      [1.0, 1.0, 0.05, 0.1],
+      [0.1, 0.05, 0.05, 0.1],
+    ])
+    widths = np.array([[10.0, 20.0, 5.0, 8.0]] * len(factors))
+    self.assert_layouts(widths, factors, 10.0)
+
+  def test_one_and_two_members(self):
+    self.assert_layouts(np.array([[12.0]]),      np.array([[0.4]]),      4.0)
+    self.assert_layouts(np.array([[12.0, 6.0]]), np.array([[0.4, 0.7]]), 4.0)
+
+  def test_random_factors(self):
+    generator = np.random.default_rng(0)
+    for count in range(2, 7):
+      factors = generator.choice([0.0, 0.01, 0.5, 1.0], size=(50, count)) * generator.random((50, count)) ** 0.1
+      widths  = generator.uniform(1.0, 30.0, size=(50, count))
+      self.assert_layouts(widths, factors, 5.0)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,124 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+from lineage_diagram          import Diagram, Lineage, Bundle
+from lineage_diagram          import bundle as bundle_module
+from lineage_diagram.segments import IndependentSegment
+
+def build_diagram(resolution:int=1000, view_width:float=1000) -> Diagram:
+  """Build a small diagram with independent, bundled, joining and leaving lineages."""
+  diagram = Diagram(view_width, 600, resolution)
+  bundle  = Bundle(diagram, 0, 300, 4)
+  bundle.shift_to(300, 400, 200)
+  Lineage.create_in_bundle(diagram, "#f00", 0, 20, bundle)
+  joining = Lineage(diagram, "#00f", 0, 80, 25)
+  joining.shift_to(100, 180, 120)
+  joining.scale_to(150, 250, 40)
+  joining.join(200, 280, bundle, 1)
+  leaving = Lineage.create_in_bundle(diagram, "#ff0", 50, 15, bundle, index=0, fade_in_duration=40)
+  leaving.leave(450, 520, bundle, 560)
+  return diagram
+
+def generate(diagram:Diagram) -> bytes:
+  """Generate the diagram and return the content of the SVG file."""
+  with tempfile.TemporaryDirectory() as directory:
+    filepath = os.path.join(directory, "diagram.svg")
+    with contextlib.redirect_stdout(io.StringIO()):
+      diagram.generate(filepath)
+    with open(filepath, "rb") as file:
+      return file.read()
+
+# Modifications of a generated diagram, re-generating must give the same output as building it with them
+MODIFICATIONS = {
+  "color":      lambda diagram: setattr(diagram._lineages[0], "color", "yellow"),
+  "resolution": lambda diagram: setattr(diagram, "resolution", 50),
+  "precision":  lambda diagram: setattr(diagram, "precision", 4),
+  "tolerance":  lambda diagram: setattr(diagram, "tolerance", 2.0),
+  "margin":     lambda diagram: setattr(diagram._bundles[0], "margin", 10),
+  "start_y":    lambda diagram: setattr(diagram._lineages[1], "start_y", 40),
+  "start_w":    lambda diagram: setattr(diagram._lineages[1], "start_w", 5),
+  "end_x":      lambda diagram: setattr(diagram._lineages[1], "end_x", 600),
+  "bundle_y":   lambda diagram: setattr(diagram._bundles[0], "start_y", 250),
+  "shift":      lambda diagram: diagram._lineages[1].shift_to(20, 60, 140),
+}
+
+class TestCacheInvalidation(unittest.TestCase):
+  """Re-generating a modified diagram must give the same output as generating it fresh."""
+
+  def test_regenerate(self):
+    for name, modify in MODIFICATIONS.items():
+      with self.subTest(name):
+        diagram = build_diagram()
+        before  = generate(diagram)
+        # Generate again with the caches populated
+        self.assertEqual(generate(diagram), before)
+        modify(diagram)
+        fresh = build_diagram()
+        modify(fresh)
+        after = generate(diagram)
+        self.assertNotEqual(after, before)
+        self.assertEqual(after, generate(fresh))
+
+  def test_view_width(self):
+    # Narrowing and widening the view must match a diagram built with that width from the start
+    for view_width in (800, 1200):
+      with self.subTest(view_width=view_width):
+        diagram = build_diagram()
+        generate(diagram)
+        diagram.view_width = view_width
+        self.assertEqual(generate(diagram), generate(build_diagram(view_width=view_width)))
+
+class TestSegmentCache(unittest.TestCase):
+  """Independent segments are recompiled only when their geometry changes."""
+
+  def count_compilations(self, diagram:Diagram, modify) -> int:
+    """Count the independent segments compiled when re-generating the diagram after a modification."""
+    generate(diagram)
+    modify(diagram)
+    with mock.patch.object(IndependentSegment, "compile", autospec=True, side_effect=IndependentSegment.compile) as compile:
+      generate(diagram)
+    return compile.call_count
+
+  def test_color_reuses_all_segments(self):
+    self.assertEqual(self.count_compilations(build_diagram(), MODIFICATIONS["color"]), 0)
+
+  def test_shift_recompiles_modified_segment_only(self):
+    self.assertEqual(self.count_compilations(build_diagram(), MODIFICATIONS["shift"]), 1)
+
+  def test_resolution_recompiles_all_segments(self):
+    diagram = build_diagram()
+    generate(diagram)
+    segments_count = sum(isinstance(segment, IndependentSegment) for lineage in diagram._lineages for segment in lineage._computed_segments)
+    self.assertGreater(segments_count, 0)
+    self.assertEqual(self.count_compilations(diagram, MODIFICATIONS["resolution"]), segments_count)
+
+class TestResampling(unittest.TestCase):
+  """The baselines are sampled again only when the geometry is invalidated."""
+
+  def count_samplings(self, diagram:Diagram) -> tuple[int, int]:
+    """Count the bundle and segment baseline samplings when re-generating the diagram."""
+    with mock.patch.object(bundle_module, "sample_path", side_effect=bundle_module.sample_path) as sample_path, \
+         mock.patch.object(IndependentSegment, "sample_baseline", autospec=True, side_effect=IndependentSegment.sample_baseline) as sample_baseline:
+      generate(diagram)
+    return sample_path.call_count, sample_baseline.call_count
+
+  def test_unchanged_resamples_nothing(self):
+    diagram = build_diagram()
+    generate(diagram)
+    self.assertEqual(self.count_samplings(diagram), (0, 0))
+
+  def test_resolution_resamples_everything(self):
+    diagram = build_diagram()
+    generate(diagram)
+    diagram.resolution = 50
+    bundle_samplings, segment_samplings = self.count_samplings(diagram)
+    self.assertGreater(bundle_samplings,  0)
+    self.assertGreater(segment_samplings, 0)
+
+if __name__ == "__main__":
+  unittest.main()
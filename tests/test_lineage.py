@@ -0,0 +1,35 @@
+import unittest
+
+from lineage_diagram       import Diagram, Lineage, Bundle
+from lineage_diagram.paths import MembershipEvent, MembershipEventType
+
+def build_diagram() -> tuple[Bundle, Lineage, Lineage]:
+  """Build a bundle with a lineage joining it and a lineage leaving it."""
+  diagram = Diagram(1000, 600)
+  bundle  = Bundle(diagram, 0, 300, 4)
+  joining = Lineage(diagram, "#00f", 0, 80, 25)
+  joining.join(200, 280, bundle)
+  leaving = Lineage.create_in_bundle(diagram, "#ff0", 0, 15, bundle)
+  leaving.leave(450, 520, bundle, 560)
+  return bundle, joining, leaving
+
+class TestBundleLookup(unittest.TestCase):
+  """The bundle of a lineage at a position follows its membership events."""
+
+  def test_join_and_leave(self):
+    bundle, joining, leaving = build_diagram()
+    self.assertIsNone(joining._get_bundle_at(100))
+    self.assertIs(joining._get_bundle_at(200), bundle)
+    self.assertIs(leaving._get_bundle_at(100), bundle)
+    self.assertIsNone(leaving._get_bundle_at(450))
+
+  def test_events_added_directly(self):
+    bundle, joining, leaving = build_diagram()
+    # Query once so that the start positions are indexed, then append to the public list
+    self.assertIs(joining._get_bundle_at(700), bundle)
+    joining.membership_events.append(MembershipEvent(600, 650, MembershipEventType.LEAVE, assembly=bundle, target_y=100))
+    self.assertIs(joining._get_bundle_at(550), bundle)
+    self.assertIsNone(joining._get_bundle_at(700))
+
+if __name__ == "__main__":
+  unittest.main()
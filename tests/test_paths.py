@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from lineage_diagram       import Diagram, Lineage
+from lineage_diagram.utils import smootherstep
+
+def reference_width_at(path:Lineage, x:float) -> float:
+  """Sequential width lookup iterating over the scale events sorted by time."""
+  if path.end_x is not None and x > path.end_x:
+    return 0.0
+  last_width = path.start_w
+  for scale_event in sorted(path._scale_events, key=lambda scale_event: scale_event.from_x):
+    if x <= scale_event.from_x:
+      return last_width
+    elif scale_event.from_x < x < scale_event.to_x:
+      ratio_linear = (x - scale_event.from_x) / (scale_event.to_x - scale_event.from_x)
+      return last_width + (scale_event.to_w - last_width) * smootherstep(ratio_linear)
+    else:
+      last_width = scale_event.to_w
+  return last_width
+
+class TestScaleTable(unittest.TestCase):
+  """The widths looked up in the scale table match the sequential lookup."""
+
+  def build_lineage(self, scale_events:list[tuple[float, float, float]]) -> Lineage:
+    lineage = Lineage(Diagram(1000, 600), "#f00", 0, 100, 20)
+    for from_x, to_x, to_w in scale_events:
+      lineage.scale_to(from_x, to_x, to_w)
+    return lineage
+
+  def assert_widths(self, lineage:Lineage):
+    # Dense positions, plus the exact boundaries of the events and their neighbours
+    boundaries = [x for event in lineage._scale_events for x in (event.from_x, event.to_x)]
+    if lineage.end_x is not None:
+      boundaries.append(lineage.end_x)
+    boundaries = np.array(boundaries, dtype=float)
+    xs = np.concatenate((
+      np.linspace(-50, 1050, 2201),
+      boundaries,
+      np.nextafter(boundaries, -np.inf),
+      np.nextafter(boundaries,  np.inf),
+    ))
+    expected = [reference_width_at(lineage, x) for x in xs]
+    np.testing.assert_allclose(lineage.get_widths_at(xs), expected, rtol=0, atol=1e-12)
+    for x in boundaries:
+      self.assertAlmostEqual(lineage.get_width_at(x), reference_width_at(lineage, x), places=12)
+
+  def test_no_events(self):
+    self.assert_widths(self.build_lineage([]))
+
+  def test_sequential_events(self):
+    self.assert_widths(self.build_lineage([(100, 200, 40), (300, 350, 10), (350, 500, 30)]))
+
+  def test_overlapping_events(self):
+    # The second event starts within the first, and the third ends within the second
+    self.assert_widths(self.build_lineage([(100, 400, 40), (200, 600, 10), (250, 300, 30), (700, 800, 5)]))
+
+  def test_zero_span_events(self):
+    self.assert_widths(self.build_lineage([(100, 100, 40), (200, 300, 10), (300, 300, 30), (300, 300, 5)]))
+
+  def test_out_of_order_events(self):
+    self.assert_widths(self.build_lineage([(500, 600, 10), (100, 200, 40), (300, 450, 25)]))
+
+  def test_end_x(self):
+    lineage = self.build_lineage([(100, 200, 40), (400, 700, 10)])
+    lineage.end_x = 550
+    self.assert_widths(lineage)
+
+  def test_events_added_after_lookup(self):
+    lineage = self.build_lineage([(100, 200, 40)])
+    lineage.get_widths_at(np.array([150.0]))
+    lineage.scale_to(50, 120, 5)
+    self.assert_widths(lineage)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+
+import numpy as np
+
+from lineage_diagram.utils import monotonic_mask, remove_folds, simplify_polyline, cubic_arc_length_table
+
+def folded_edge() -> np.ndarray:
+  """Edge going up along y=x/2, folding back from X 6 to X 4, then going down along y=8-x."""
+  before = [complex(x, 0.5 * x) for x in range(0, 7)]
+  loop   = [complex(5, 3.5)]
+  after  = [complex(x, 8 - x) for x in range(4, 11)]
+  return np.array(before + loop + after)
+
+class TestMonotonicMask(unittest.TestCase):
+  """The kept points never go backward in X."""
+
+  def test_monotone_edge_is_kept(self):
+    self.assertTrue(monotonic_mask(np.array([0.0, 1.0, 1.0, 2.5, 4.0])).all())
+
+  def test_loop_is_dropped(self):
+    xs   = folded_edge().real
+    keep = monotonic_mask(xs)
+    # The points from the turn back at X 5 to the turn forward at X 5 are dropped
+    np.testing.assert_array_equal(np.flatnonzero(~keep), [5, 6, 7, 8, 9])
+    self.assertTrue(np.all(np.diff(xs[keep]) >= 0))
+
+class TestRemoveFolds(unittest.TestCase):
+  """The loops of folded edges are removed."""
+
+  def test_unfolded_edge_is_unchanged(self):
+    points = np.array([0, 1+1j, 2+1j, 3+0.5j])
+    np.testing.assert_array_equal(remove_folds(points), points)
+
+  def test_output_is_monotone(self):
+    result = remove_folds(folded_edge())
+    self.assertTrue(np.all(np.diff(result.real) >= 0))
+
+  def test_loop_is_removed(self):
+    points = folded_edge()
+    result = remove_folds(points)
+    # Only the points outside the loop remain, plus the point closing it
+    for point in points[5:10]:
+      self.assertNotIn(point, result)
+    self.assertEqual(len(result), len(points) - 5 + 1)
+
+  def test_crossing_point(self):
+    # The loop is closed where y=x/2 crosses y=8-x, between the kept points at X 4 and X 6
+    result = remove_folds(folded_edge())
+    self.assertAlmostEqual(result[5], complex(16/3, 8/3))
+    np.testing.assert_array_equal(result[[4, 6]], [4+2j, 6+2j])
+
+  def test_fold_at_first_point(self):
+    # The edge starts going backward, there is no edge before the loop to cross
+    points = np.array([2+0j, 1+1j, 0+2j, 1+3j, 2+4j, 3+5j])
+    result = remove_folds(points)
+    np.testing.assert_array_equal(result, points[4:])
+
+  def test_fold_at_last_point(self):
+    # The edge ends going backward, there is no edge after the loop to cross
+    points = np.array([0+0j, 1+1j, 2+2j, 3+3j, 2+4j, 1+5j])
+    result = remove_folds(points)
+    np.testing.assert_array_equal(result, points[:2])
+
+def line_distances(points:np.ndarray, first:complex, last:complex) -> np.ndarray:
+  """Distances of points to the line through two points, or to the first point if they coincide."""
+  chord = last - first
+  if chord == 0:
+    return np.abs(points - first)
+  return np.abs(((points - first) * chord.conjugate()).imag) / abs(chord)
+
+class TestSimplifyPolyline(unittest.TestCase):
+  """The simplified polyline stays within the tolerance of the original one."""
+
+  def assert_within_tolerance(self, points:np.ndarray, tolerance:float) -> np.ndarray:
+    """Check that every dropped point is within the tolerance of the chord joining the kept points around it."""
+    result = simplify_polyline(points, tolerance)
+    kept   = np.flatnonzero(np.isin(points, result))
+    np.testing.assert_array_equal(points[kept], result)
+    self.assertEqual(kept[0],  0)
+    self.assertEqual(kept[-1], len(points) - 1)
+    for first, last in zip(kept[:-1], kept[1:]):
+      distances = line_distances(points[first+1:last], points[first], points[last])
+      self.assertTrue(np.all(distances <= tolerance))
+    return result
+
+  def test_straight_line_is_reduced_to_its_ends(self):
+    points = np.linspace(0, 100+50j, 51)
+    np.testing.assert_array_equal(simplify_polyline(points, 1e-9), points[[0, -1]])
+
+  def test_dropped_points_within_tolerance(self):
+    generator = np.random.default_rng(0)
+    xs        = np.linspace(0, 100, 401)
+    points    = xs + 1j * (10 * np.sin(xs / 8) + generator.normal(0, 0.2, xs.size))
+    for tolerance in (0.1, 0.5, 2.0):
+      with self.subTest(tolerance=tolerance):
+        result = self.assert_within_tolerance(points, tolerance)
+        self.assertLess(len(result), len(points))
+
+  def test_closed_polyline(self):
+    # The chord between the ends is empty, the distances are to the common end
+    angles = np.linspace(0, 2 * np.pi, 33)
+    points = 10 * np.exp(1j * angles)
+    points[-1] = points[0]
+    result = self.assert_within_tolerance(points, 0.5)
+    self.assertGreater(len(result), 2)
+    np.testing.assert_array_equal(simplify_polyline(points, 25), points[[0, -1]])
+
+  def test_no_tolerance(self):
+    points = np.array([0, 1+0j, 2+0j, 3+1e-12j, 4+0j])
+    for tolerance in (0, -1):
+      with self.subTest(tolerance=tolerance):
+        np.testing.assert_array_equal(simplify_polyline(points, tolerance), points)
+
+class TestCubicArcLengthTable(unittest.TestCase):
+  """The cached arc length tables cannot be modified by their callers."""
+
+  def test_tables_are_read_only(self):
+    for bpoints in ((0, 10+0j, 20+30j, 40+30j), (5+5j, 5+5j, 5+5j, 5+5j)):
+      with self.subTest(bpoints=bpoints):
+        ts, fractions = cubic_arc_length_table(*bpoints)
+        self.assertEqual((fractions[0], fractions[-1]), (0.0, 1.0))
+        with self.assertRaises(ValueError):
+          ts[0] = 1.0
+        with self.assertRaises(ValueError):
+          fractions[0] = 1.0
+
+if __name__ == "__main__":
+  unittest.main()